@@ -1,9 +1,10 @@
 import abc
 import inspect
 import re
-from typing import Any, ClassVar, Sequence, cast
+from typing import Any, Callable, ClassVar, Sequence, cast
+
+from django.db import connections
 
-from langchain.agents import AgentExecutor
 from langchain.agents.format_scratchpad.tools import (
     format_to_tool_messages,
 )
@@ -34,15 +35,23 @@ from langchain_core.runnables import (
     RunnableBranch,
     RunnablePassthrough,
 )
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI
 
 from django_ai_assistant.decorators import with_cast_id
 from django_ai_assistant.exceptions import (
     AIAssistantMisconfiguredError,
 )
-from django_ai_assistant.langchain.tools import Tool
+from django_ai_assistant.helpers.http_clients import (
+    get_http_async_client,
+    get_shared_http_client,
+)
+from django_ai_assistant.langchain.agents import ParallelToolsAgentExecutor, _in_atomic_block
+from django_ai_assistant.langchain.callbacks import AGENT_LLM_TAG, DeltaCallbackHandler
+from django_ai_assistant.langchain.tools import StructuredTool, Tool
 from django_ai_assistant.langchain.tools import tool as tool_decorator
 
 
@@ -74,6 +83,20 @@ class AIAssistant(abc.ABC):  # noqa: F821
     """
     temperature: float = 1.0
     """Temperature to use for the assistant LLM model.\nDefaults to `1.0`."""
+    streaming: bool = True
+    """Whether the LLM is called in a streaming fashion in each step of the agent.\n
+    Defaults to `True`, which makes the LLM tokens available to Langchain callbacks
+    and `astream_events`. Required by the `on_delta` argument of `invoke` and `run`.\n
+    Set to `False` when the tokens are not consumed,
+    so each step makes a single non-streaming request to the LLM,
+    instead of parsing and merging every token chunk of the response."""
+    max_concurrent_tools: int = 8
+    """Maximum number of tool calls to run concurrently, in separate threads,
+    when the LLM requests multiple tools at once.\n
+    Defaults to `8`. Set to `1` to run tools one after the other in the current thread,
+    for example when tools aren't thread-safe.
+    Tools always run in the current thread inside a database transaction,
+    since each thread uses its own database connection."""
     has_rag: bool = False
     """Whether the assistant uses RAG (Retrieval-Augmented Generation) or not.\n
     Defaults to `False`.
@@ -101,6 +124,26 @@ class AIAssistant(abc.ABC):  # noqa: F821
     Can be used in any `@method_tool` to customize behavior."""
     _method_tools: Sequence[BaseTool]
     """List of `@method_tool` tools the assistant can use. Automatically set by the constructor."""
+    _retriever: BaseRetriever | None
+    """The RAG retriever returned by `get_retriever`, cached on the first use.\n
+    Reused by next invocations of the same assistant instance."""
+    _tool_caches: dict[Any, dict]
+    """Outputs of cacheable tools, per thread ID. Set by the constructor.\n
+    Tools are cacheable when declared with `@method_tool(cacheable=True)`,
+    or when they have `metadata={"cacheable": True}`.
+    The cache is per assistant instance and thread, so outputs don't leak across
+    users or conversations. Invocations without a thread ID get a new cache each,
+    since they aren't part of the same conversation."""
+    _tool_method_names: ClassVar[list[str]]
+    """Names of the `@method_tool` methods, sorted by declaration order.\n
+    Automatically set per class by `_get_tool_method_names`."""
+    _tool_args_schemas: ClassVar[dict[str, Any]]
+    """Inferred `args_schema` of the `@method_tool` tools by method name.\n
+    Automatically set per class by `_set_method_tools`."""
+    _tool_openai_schemas: ClassVar[dict[str, tuple[tuple, dict]]]
+    """OpenAI tool definitions of the `@method_tool` tools by tool name,
+    along with the tool attributes they were converted from.\n
+    Automatically set per class by `_get_llm_tools`."""
 
     _registry: ClassVar[dict[str, type["AIAssistant"]]] = {}
     """Registry of all AIAssistant subclasses by their id.\n
@@ -126,6 +169,8 @@ class AIAssistant(abc.ABC):  # noqa: F821
         self._request = request
         self._view = view
         self._init_kwargs = kwargs
+        self._tool_caches = {}
+        self._retriever = None
 
         self._set_method_tools()
 
@@ -155,29 +200,57 @@ class AIAssistant(abc.ABC):  # noqa: F821
 
         cls._registry[cls.id] = cls
 
+    @classmethod
+    def _get_tool_method_names(cls) -> list[str]:
+        # Cached per class, because inspecting members and reading the source code is slow,
+        # and it would otherwise happen every time an assistant is instantiated.
+        # Check `cls.__dict__` to avoid using the cache of a parent class:
+        if "_tool_method_names" not in cls.__dict__:
+            # Find tool methods (decorated with `@method_tool` from django_ai_assistant/tools.py):
+            members = inspect.getmembers(cls, predicate=lambda m: getattr(m, "_is_tool", False))
+
+            # Sort tool methods by the order they appear in the source code,
+            # since this can be meaningful:
+            members.sort(key=lambda m: inspect.getsourcelines(m[1])[1])
+
+            cls._tool_method_names = [name for name, _ in members]
+        return cls._tool_method_names
+
     def _set_method_tools(self):
-        # Find tool methods (decorated with `@method_tool` from django_ai_assistant/tools.py):
-        members = inspect.getmembers(
-            self,
-            predicate=lambda m: inspect.ismethod(m) and getattr(m, "_is_tool", False),
-        )
-        tool_methods = [m for _, m in members]
+        tool_methods = [getattr(self, name) for name in self._get_tool_method_names()]
+        tool_methods = [m for m in tool_methods if inspect.ismethod(m)]
 
-        # Sort tool methods by the order they appear in the source code,
-        # since this can be meaningful:
-        tool_methods.sort(key=lambda m: inspect.getsourcelines(m)[1])
+        # Inferring the args_schema of a tool creates pydantic models, which is slow.
+        # It doesn't depend on the instance, so it's cached per class.
+        # Check `cls.__dict__` to avoid using the cache of a parent class:
+        cls = self.__class__
+        if "_tool_args_schemas" not in cls.__dict__:
+            cls._tool_args_schemas = {}
+        args_schemas = cls._tool_args_schemas
 
         # Transform tool methods into tool objects:
         tools = []
         for method in tool_methods:
-            if hasattr(method, "_tool_maker_args"):
-                tool = tool_decorator(
-                    *method._tool_maker_args,
-                    **method._tool_maker_kwargs,
-                )(method)
+            tool_maker_args = getattr(method, "_tool_maker_args", ())
+            tool_maker_kwargs = getattr(method, "_tool_maker_kwargs", {})
+            inferred_schema = "args_schema" not in tool_maker_kwargs
+            if inferred_schema and method.__name__ in args_schemas:
+                tool_maker_kwargs = {
+                    **tool_maker_kwargs,
+                    "args_schema": args_schemas[method.__name__],
+                }
+
+            if tool_maker_args:
+                tool = tool_decorator(*tool_maker_args, **tool_maker_kwargs)(method)
             else:
-                tool = tool_decorator(method)
-            tools.append(cast(BaseTool, tool))
+                tool = tool_decorator(method, **tool_maker_kwargs)
+            tool = cast(BaseTool, tool)
+
+            if inferred_schema and isinstance(tool, StructuredTool):
+                args_schemas[method.__name__] = tool.args_schema
+            if getattr(method, "_is_cacheable_tool", False):
+                tool.metadata = {**(tool.metadata or {}), "cacheable": True}
+            tools.append(tool)
 
         # Remove self from each tool args_schema:
         for tool in tools:
@@ -188,6 +261,32 @@ class AIAssistant(abc.ABC):  # noqa: F821
 
         self._method_tools = tools
 
+    def _get_llm_tools(self, tools: Sequence[BaseTool]) -> list[BaseTool | dict]:
+        # Converting a tool to the OpenAI format builds and dereferences its JSON schema,
+        # which `bind_tools` would do for every tool on every invocation.
+        # Method tools usually don't change per instance, so their conversion is cached per class.
+        # The cached conversion is only used while the attributes it depends on still match,
+        # e.g., not when an overridden `get_tools` sets a per-user description.
+        # Other tools, e.g., added by an overridden `get_tools`, are left for `bind_tools`:
+        cls = self.__class__
+        if "_tool_openai_schemas" not in cls.__dict__:
+            cls._tool_openai_schemas = {}
+        openai_schemas = cls._tool_openai_schemas
+
+        method_tool_ids = {id(tool) for tool in self._method_tools}
+        llm_tools: list[BaseTool | dict] = []
+        for tool in tools:
+            if id(tool) not in method_tool_ids:
+                llm_tools.append(tool)
+                continue
+            cache_key = (tool.description, tool.args_schema, tool.return_direct)
+            cached = openai_schemas.get(tool.name)
+            if cached is None or cached[0] != cache_key:
+                cached = (cache_key, convert_to_openai_tool(tool))
+                openai_schemas[tool.name] = cached
+            llm_tools.append(cached[1])
+        return llm_tools
+
     @classmethod
     def get_cls_registry(cls) -> dict[str, type["AIAssistant"]]:
         """Get the registry of AIAssistant classes.
@@ -308,7 +407,9 @@ class AIAssistant(abc.ABC):  # noqa: F821
 
     def get_llm(self) -> BaseChatModel:
         """Get the Langchain LLM instance for the assistant.
-        By default, this uses the OpenAI implementation.\n
+        By default, this uses the OpenAI implementation,
+        with a sync HTTP client shared across instances to reuse connections,
+        and a new async HTTP client that reuses the shared SSL context.\n
         `get_model`, `get_temperature`, and `get_model_kwargs` are used to create the LLM instance.\n
         Override this method to use a different LLM implementation.
 
@@ -322,6 +423,8 @@ class AIAssistant(abc.ABC):  # noqa: F821
             model=model,
             temperature=temperature,
             model_kwargs=model_kwargs,
+            http_client=get_shared_http_client(),
+            http_async_client=get_http_async_client(),
         )
 
     def get_tools(self) -> Sequence[BaseTool]:
@@ -368,6 +471,8 @@ class AIAssistant(abc.ABC):  # noqa: F821
     def get_retriever(self) -> BaseRetriever:
         """Get the RAG retriever to use for fetching documents.\n
         Must be implemented by subclasses when `has_rag=True`.\n
+        Called only once per assistant instance, the retriever is reused across invocations,
+        since creating a retriever may be expensive, e.g., connecting to a vector store.\n
 
         Returns:
             BaseRetriever: the RAG retriever to use for fetching documents.
@@ -423,7 +528,9 @@ class AIAssistant(abc.ABC):  # noqa: F821
             Runnable[dict, RetrieverOutput]: a history-aware retriever Langchain chain.
         """
         llm = self.get_llm()
-        retriever = self.get_retriever()
+        if self._retriever is None:
+            self._retriever = self.get_retriever()
+        retriever = self._retriever
         prompt = self.get_contextualize_prompt()
 
         # Based on create_history_aware_retriever:
@@ -465,7 +572,7 @@ class AIAssistant(abc.ABC):  # noqa: F821
         prompt = self.get_prompt_template()
         tools = cast(Sequence[BaseTool], tools)
         if tools:
-            llm_with_tools = llm.bind_tools(tools)
+            llm_with_tools = llm.bind_tools(self._get_llm_tools(tools))
         else:
             llm_with_tools = llm
         chain = (
@@ -494,11 +601,19 @@ class AIAssistant(abc.ABC):  # noqa: F821
                 }
             ).with_config(run_name="format_input_docs")
 
-        chain = chain | prompt | llm_with_tools | ToolsAgentOutputParser()
+        chain = (
+            chain
+            | prompt
+            | llm_with_tools.with_config(tags=[AGENT_LLM_TAG])
+            | ToolsAgentOutputParser()
+        )
 
-        agent_executor = AgentExecutor(
+        agent_executor = ParallelToolsAgentExecutor(
             agent=chain,  # pyright: ignore[reportArgumentType]
             tools=tools,
+            stream_runnable=self.streaming,
+            max_concurrent_tools=self.max_concurrent_tools,
+            tool_cache={} if thread_id is None else self._tool_caches.setdefault(thread_id, {}),
         )
         agent_with_chat_history = RunnableWithMessageHistory(
             agent_executor,  # pyright: ignore[reportArgumentType]
@@ -522,8 +637,26 @@ class AIAssistant(abc.ABC):  # noqa: F821
 
         return agent_with_chat_history
 
+    def _as_chain_with_on_delta(
+        self, thread_id: Any | None, on_delta: Callable[[str], None] | None
+    ) -> Runnable[dict, dict]:
+        chain = self.as_chain(thread_id)
+        if on_delta is None:
+            return chain
+        if not self.streaming:
+            raise AIAssistantMisconfiguredError(
+                f"{self.__class__.__name__} has streaming=False, so on_delta can't be used."
+            )
+        return chain.with_config(callbacks=[DeltaCallbackHandler(on_delta)])
+
     @with_cast_id
-    def invoke(self, *args: Any, thread_id: Any | None, **kwargs: Any) -> dict:
+    def invoke(
+        self,
+        *args: Any,
+        thread_id: Any | None,
+        on_delta: Callable[[str], None] | None = None,
+        **kwargs: Any,
+    ) -> dict:
         """Invoke the assistant Langchain chain with the given arguments and keyword arguments.\n
         This is the lower-level method to run the assistant.\n
         The chain is created by the `as_chain` method.\n
@@ -533,15 +666,114 @@ class AIAssistant(abc.ABC):  # noqa: F821
                 Make sure to include a `dict` like `{"input": "user message"}`.
             thread_id (Any | None): The thread ID for the chat message history.
                 If `None`, an in-memory chat message history is used.
+            on_delta (Callable[[str], None] | None): Function called with each text token
+                of the assistant response, as the LLM streams it. Defaults to `None`.
+                Requires `streaming=True`.
             **kwargs: Keyword arguments to pass to the chain.
 
         Returns:
             dict: The output of the assistant chain,
                 structured like `{"output": "assistant response", "history": ...}`.
         """
-        chain = self.as_chain(thread_id)
+        chain = self._as_chain_with_on_delta(thread_id, on_delta)
         return chain.invoke(*args, **kwargs)
 
+    @with_cast_id
+    async def ainvoke(
+        self,
+        *args: Any,
+        thread_id: Any | None,
+        on_delta: Callable[[str], None] | None = None,
+        **kwargs: Any,
+    ) -> dict:
+        """Async version of `invoke`.
+        Invoke the assistant Langchain chain with the given arguments and keyword arguments.\n
+        The LLM calls don't block the current thread, and the tool calls of a single step
+        run concurrently. Sync tools run in a thread pool,
+        and the database connections they open are closed when they finish.\n
+        Note the chain is created by `as_chain` in the event loop thread,
+        so the methods it calls, like `get_llm`, `get_tools`, and `get_retriever`,
+        must not block, e.g., with database queries or network calls.
+        Wrap them with `sync_to_async` or prepare their data before calling `ainvoke`.\n
+
+        Args:
+            *args: Positional arguments to pass to the chain.
+                Make sure to include a `dict` like `{"input": "user message"}`.
+            thread_id (Any | None): The thread ID for the chat message history.
+                If `None`, an in-memory chat message history is used.
+            on_delta (Callable[[str], None] | None): Function called with each text token
+                of the assistant response, as the LLM streams it. Defaults to `None`.
+                Requires `streaming=True`.
+            **kwargs: Keyword arguments to pass to the chain.
+
+        Returns:
+            dict: The output of the assistant chain,
+                structured like `{"output": "assistant response", "history": ...}`.
+        """
+        chain = self._as_chain_with_on_delta(thread_id, on_delta)
+        return await chain.ainvoke(*args, **kwargs)
+
+    def batch_invoke(
+        self,
+        inputs: Sequence[dict],
+        thread_ids: Sequence[Any | None] | None = None,
+        max_concurrency: int | None = None,
+        **kwargs: Any,
+    ) -> list[dict]:
+        """Invoke the assistant Langchain chain for many inputs concurrently.\n
+        Useful for non-interactive workloads, like evaluations and background jobs.
+        Each input is a separate invocation, as in `invoke`, and they run in a thread pool,
+        so the total time is close to the slowest invocation instead of the sum of all.\n
+        Each invocation runs on its own assistant instance, created with the same
+        constructor arguments as this one, so no instance state, like the RAG retriever
+        or the tool outputs cache, is shared across the concurrent invocations.\n
+        Each thread of the pool uses its own database connections, so they wouldn't see
+        the uncommitted changes of a transaction open in the caller thread,
+        and their changes wouldn't be part of that transaction.
+        Because of that, inside a database transaction, e.g., under `ATOMIC_REQUESTS` or
+        `transaction.atomic()`, the invocations run one after the other in the current thread.\n
+
+        Args:
+            inputs (Sequence[dict]): The inputs to pass to the chain, one per invocation.
+                Each one is a `dict` like `{"input": "user message"}`.
+            thread_ids (Sequence[Any | None] | None): The thread IDs for the chat message history
+                of each input. Must have the same length as `inputs`. Defaults to `None`,
+                which uses an in-memory chat message history for every input.
+                Invocations run concurrently, so don't repeat a thread ID.
+            max_concurrency (int | None): Maximum number of concurrent invocations.
+                Defaults to `None`, which uses the thread pool default.
+            **kwargs: Keyword arguments to pass to each chain invocation.
+
+        Returns:
+            list[dict]: The outputs of the assistant chain, in the same order as `inputs`,
+                each structured like `{"output": "assistant response", "history": ...}`.
+        """
+        if thread_ids is None:
+            thread_ids = [None] * len(inputs)
+        if len(thread_ids) != len(inputs):
+            raise ValueError("thread_ids must have the same length as inputs")
+
+        def invoke(input_: dict, thread_id: Any | None) -> dict:
+            assistant = type(self)(
+                user=self._user, request=self._request, view=self._view, **self._init_kwargs
+            )
+            return assistant.invoke(input_, thread_id=thread_id, **kwargs)
+
+        def invoke_in_thread(input_: dict, thread_id: Any | None) -> dict:
+            try:
+                return invoke(input_, thread_id)
+            finally:
+                # Django opens one database connection per thread:
+                connections.close_all()
+
+        if _in_atomic_block():
+            return [
+                invoke(input_, thread_id)
+                for input_, thread_id in zip(inputs, thread_ids, strict=True)
+            ]
+        with ContextThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            return list(executor.map(invoke_in_thread, inputs, thread_ids))
+
     @with_cast_id
     def run(self, message: str, thread_id: Any | None = None, **kwargs: Any) -> str:
         """Run the assistant with the given message and thread ID.\n
@@ -551,7 +783,8 @@ class AIAssistant(abc.ABC):  # noqa: F821
             message (str): The user message to pass to the assistant.
             thread_id (Any | None): The thread ID for the chat message history.
                 If `None`, an in-memory chat message history is used.
-            **kwargs: Additional keyword arguments to pass to the chain.
+            **kwargs: Additional keyword arguments to pass to `invoke`,
+                like `on_delta` to receive the response tokens as they're streamed.
 
         Returns:
             str: The assistant response to the user message.
@@ -564,6 +797,30 @@ class AIAssistant(abc.ABC):  # noqa: F821
             **kwargs,
         )["output"]
 
+    @with_cast_id
+    async def arun(self, message: str, thread_id: Any | None = None, **kwargs: Any) -> str:
+        """Async version of `run`. Run the assistant with the given message and thread ID.\n
+
+        Args:
+            message (str): The user message to pass to the assistant.
+            thread_id (Any | None): The thread ID for the chat message history.
+                If `None`, an in-memory chat message history is used.
+            **kwargs: Additional keyword arguments to pass to `invoke`,
+                like `on_delta` to receive the response tokens as they're streamed.
+
+        Returns:
+            str: The assistant response to the user message.
+        """
+        return (
+            await self.ainvoke(
+                {
+                    "input": message,
+                },
+                thread_id=thread_id,
+                **kwargs,
+            )
+        )["output"]
+
     def _run_as_tool(self, message: str, **kwargs: Any) -> str:
         return self.run(message, thread_id=None, **kwargs)
 
@@ -0,0 +1,72 @@
+"""Shared HTTP clients for the OpenAI API.
+
+Creating an HTTP client loads the CA certificates into a new SSL context, which takes tens of
+milliseconds, and a new client can't reuse the open connections of the previous ones.
+Since `AIAssistant.get_llm` creates a new LLM instance for every invocation,
+it uses a process-wide sync client from this module, and async clients that share
+the process-wide SSL context, instead of letting each LLM instance create its own.
+
+Trade-off of the async clients: `ChatOpenAI` always creates its async OpenAI client,
+even for sync invocations, so `get_llm` creates a new async HTTP client on every call,
+e.g., twice per RAG invocation. Without requests, a client opens no connections and is cheap.
+After async requests, its connections aren't reused by the next invocation, and aren't closed
+explicitly: their sockets are closed when the client is garbage collected along with its LLM.
+Override `get_llm` to manage the async client lifetime differently, e.g., calling `aclose()`.
+"""
+
+import os
+import ssl
+import threading
+
+import httpx
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+
+_lock = threading.Lock()
+_ssl_context: ssl.SSLContext | None = None
+_http_client: httpx.Client | None = None
+
+
+def _get_ssl_context() -> ssl.SSLContext:
+    global _ssl_context
+    with _lock:
+        if _ssl_context is None:
+            _ssl_context = httpx.create_ssl_context()
+        return _ssl_context
+
+
+def _get_client_kwargs() -> dict:
+    client_kwargs: dict = {"verify": _get_ssl_context()}
+    # Same env var langchain-openai uses when it creates the clients:
+    openai_proxy = os.environ.get("OPENAI_PROXY")
+    if openai_proxy:
+        client_kwargs["proxy"] = openai_proxy
+    return client_kwargs
+
+
+def get_shared_http_client() -> httpx.Client:
+    """Get the process-wide sync HTTP client for the OpenAI API.\n
+    The client is thread-safe and keeps a pool of open connections across invocations.
+
+    Returns:
+        httpx.Client: The shared sync HTTP client.
+    """
+    global _http_client
+    client_kwargs = _get_client_kwargs()
+    with _lock:
+        if _http_client is None:
+            _http_client = DefaultHttpxClient(**client_kwargs)
+        return _http_client
+
+
+def get_http_async_client() -> httpx.AsyncClient:
+    """Get a new async HTTP client for the OpenAI API, using the process-wide SSL context.\n
+    Async clients can't be shared across event loops, and the open connections of a client
+    keep a reference to their event loop. So instead of being kept globally,
+    a new client is created for each LLM instance, which is cheap with the shared SSL context,
+    and is freed along with it.
+
+    Returns:
+        httpx.AsyncClient: A new async HTTP client.
+    """
+    return DefaultAsyncHttpxClient(**_get_client_kwargs())
@@ -0,0 +1,309 @@
+import functools
+import json
+import logging
+from collections.abc import Iterator
+from concurrent.futures import as_completed
+from typing import Any, cast
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from langchain.agents import AgentExecutor
+from langchain.agents.agent import ExceptionTool
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForChainRun,
+    CallbackManagerForChainRun,
+)
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from langchain_core.tools import BaseTool, StructuredTool, Tool
+
+
+logger = logging.getLogger(__name__)
+
+
+def _serialize_observation(observation: Any) -> str:
+    if isinstance(observation, str):
+        return observation
+    try:
+        # Same format Langchain uses for tool messages,
+        # but supports dates, decimals, UUIDs, and lazy strings:
+        return json.dumps(observation, ensure_ascii=False, cls=DjangoJSONEncoder)
+    except (TypeError, ValueError):
+        return str(observation)
+
+
+def _is_sync_tool(tool: BaseTool) -> bool:
+    if isinstance(tool, StructuredTool | Tool):
+        return tool.coroutine is None
+    return type(tool)._arun is BaseTool._arun
+
+
+@functools.cache
+def _get_closing_connections_tool_class(tool_class: type[BaseTool]) -> type[BaseTool]:
+    class ClosingConnectionsTool(tool_class):  # pyright: ignore
+        # Keeps the signature of the original `_run`, which Langchain inspects:
+        @functools.wraps(tool_class._run)
+        def _run(self, *args: Any, **kwargs: Any) -> Any:
+            try:
+                return super()._run(*args, **kwargs)
+            finally:
+                # Langchain runs sync tools in a thread of the default executor
+                # on the async path, and Django opens one connection per thread:
+                connections.close_all()
+
+    ClosingConnectionsTool.__name__ = tool_class.__name__
+    ClosingConnectionsTool.__qualname__ = tool_class.__qualname__
+    return ClosingConnectionsTool
+
+
+def _with_closing_connections(tool: BaseTool) -> BaseTool:
+    # Copy of the tool that closes the database connections after its sync body runs,
+    # in the same thread. The callbacks still run in the event loop thread:
+    tool_class = _get_closing_connections_tool_class(type(tool))
+    return tool_class.construct(_fields_set=tool.__fields_set__, **tool.__dict__)
+
+
+def _in_atomic_block() -> bool:
+    # Connections are per thread, so tools running in other threads would neither see
+    # the uncommitted changes of the caller transaction nor be rolled back with it:
+    return any(conn.in_atomic_block for conn in connections.all(initialized_only=True))
+
+
+class ParallelToolsAgentExecutor(AgentExecutor):
+    """Agent executor that runs the tool calls of a single agent step concurrently.
+
+    When the LLM requests multiple tools at once (OpenAI parallel function calling),
+    the default `AgentExecutor` runs them one after the other in the sync path,
+    so the step latency is the sum of the tools latencies.
+    This executor runs them in a thread pool instead, so the step latency is
+    the latency of the slowest tool. Observations keep the order of the tool calls.\n
+    Steps with a single tool call still run in the current thread.
+    So do all steps when the current thread is inside a database transaction,
+    e.g., under `ATOMIC_REQUESTS` or `transaction.atomic()`,
+    because tools in the thread pool would use their own database connections.\n
+    Tool outputs that are not strings are serialized to JSON once, when the tool returns,
+    instead of in every following step of the agent.
+    """
+
+    max_concurrent_tools: int = 8
+    """Maximum number of tool calls of a single step to run concurrently. Defaults to `8`.\n
+    Set to `1` to run all tool calls in the current thread."""
+    tool_cache: Any = None
+    """Dict to cache the outputs of tools with `metadata={"cacheable": True}`,
+    by tool name and input. Defaults to `None`, which disables the cache.\n
+    Typed as `Any` so pydantic keeps the same dict instead of copying it,
+    allowing the cache to be shared across executors."""
+
+    def _iter_next_step(
+        self,
+        name_to_tool_map: dict[str, BaseTool],
+        color_mapping: dict[str, str],
+        inputs: dict[str, str],
+        intermediate_steps: list[tuple[AgentAction, str]],
+        run_manager: CallbackManagerForChainRun | None = None,
+    ) -> Iterator[AgentFinish | AgentAction | AgentStep]:
+        # Based on AgentExecutor._iter_next_step, the only change is on how actions are performed:
+        try:
+            intermediate_steps = self._prepare_intermediate_steps(intermediate_steps)
+
+            # Call the LLM to see what to do.
+            output = self.agent.plan(
+                intermediate_steps,
+                callbacks=run_manager.get_child() if run_manager else None,
+                **inputs,
+            )
+        except OutputParserException as e:
+            if isinstance(self.handle_parsing_errors, bool):
+                raise_error = not self.handle_parsing_errors
+            else:
+                raise_error = False
+            if raise_error:
+                raise ValueError(
+                    "An output parsing error occurred. "
+                    "In order to pass this error back to the agent and have it try "
+                    "again, pass `handle_parsing_errors=True` to the AgentExecutor. "
+                    f"This is the error: {e!s}"
+                ) from e
+            text = str(e)
+            if isinstance(self.handle_parsing_errors, bool):
+                if e.send_to_llm:
+                    observation = str(e.observation)
+                    text = str(e.llm_output)
+                else:
+                    observation = "Invalid or incomplete response"
+            elif isinstance(self.handle_parsing_errors, str):
+                observation = self.handle_parsing_errors
+            elif callable(self.handle_parsing_errors):
+                observation = self.handle_parsing_errors(e)
+            else:
+                raise ValueError("Got unexpected type of `handle_parsing_errors`") from e
+            output = AgentAction("_Exception", observation, text)
+            if run_manager:
+                run_manager.on_agent_action(output, color="green")
+            tool_run_kwargs = self.agent.tool_run_logging_kwargs()
+            observation = ExceptionTool().run(
+                output.tool_input,
+                verbose=self.verbose,
+                color=None,
+                callbacks=run_manager.get_child() if run_manager else None,
+                **tool_run_kwargs,
+            )
+            yield AgentStep(action=output, observation=observation)
+            return
+
+        # If the tool chosen is the finishing tool, then we end and return.
+        if isinstance(output, AgentFinish):
+            yield output
+            return
+
+        actions: list[AgentAction]
+        if isinstance(output, AgentAction):
+            actions = [output]
+        else:
+            actions = output
+        yield from actions
+        yield from self._perform_agent_actions(
+            name_to_tool_map, color_mapping, actions, run_manager
+        )
+
+    def _perform_agent_actions(
+        self,
+        name_to_tool_map: dict[str, BaseTool],
+        color_mapping: dict[str, str],
+        actions: list[AgentAction],
+        run_manager: CallbackManagerForChainRun | None = None,
+    ) -> list[AgentStep]:
+        # Find unknown tools in a single pass before submitting anything.
+        # Their observation comes from InvalidTool, which is cheap and doesn't need a thread:
+        known_indexes: list[int] = []
+        unknown_indexes: list[int] = []
+        for index, agent_action in enumerate(actions):
+            if agent_action.tool in name_to_tool_map:
+                known_indexes.append(index)
+            else:
+                unknown_indexes.append(index)
+        if len(known_indexes) <= 1 or self.max_concurrent_tools <= 1 or _in_atomic_block():
+            return [
+                self._perform_agent_action(
+                    name_to_tool_map, color_mapping, agent_action, run_manager
+                )
+                for agent_action in actions
+            ]
+
+        max_workers = min(len(known_indexes), self.max_concurrent_tools)
+        # Results are assigned by the index of their action, so they keep the tool calls order
+        # regardless of the order tools finish:
+        steps: list[AgentStep | None] = [None] * len(actions)
+        errors: list[BaseException | None] = [None] * len(actions)
+        for index in unknown_indexes:
+            steps[index] = self._perform_agent_action(
+                name_to_tool_map, color_mapping, actions[index], run_manager
+            )
+        with ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_index = {
+                executor.submit(
+                    self._perform_agent_action_in_thread,
+                    name_to_tool_map,
+                    color_mapping,
+                    actions[index],
+                    run_manager,
+                ): index
+                for index in known_indexes
+            }
+            # Wait for all tool calls,
+            # so a failing tool doesn't leave its siblings running in the background:
+            for future in as_completed(future_to_index):
+                index = future_to_index[future]
+                error = future.exception()
+                if error is None:
+                    steps[index] = future.result()
+                else:
+                    errors[index] = error
+
+        raised_errors = [error for error in errors if error is not None]
+        if raised_errors:
+            for error in raised_errors[1:]:
+                logger.error("Concurrent tool call failed", exc_info=error)
+            raise raised_errors[0]
+        return cast(list[AgentStep], steps)
+
+    def _get_tool_cache_key(
+        self,
+        name_to_tool_map: dict[str, BaseTool],
+        agent_action: AgentAction,
+    ) -> tuple[str, str] | None:
+        if self.tool_cache is None:
+            return None
+        tool = name_to_tool_map.get(agent_action.tool)
+        if tool is None or not (tool.metadata or {}).get("cacheable", False):
+            return None
+        try:
+            tool_input = json.dumps(agent_action.tool_input, sort_keys=True, cls=DjangoJSONEncoder)
+        except (TypeError, ValueError):
+            return None
+        return (agent_action.tool, tool_input)
+
+    def _perform_agent_action(
+        self,
+        name_to_tool_map: dict[str, BaseTool],
+        color_mapping: dict[str, str],
+        agent_action: AgentAction,
+        run_manager: CallbackManagerForChainRun | None = None,
+    ) -> AgentStep:
+        cache_key = self._get_tool_cache_key(name_to_tool_map, agent_action)
+        if cache_key is not None and cache_key in self.tool_cache:
+            if run_manager:
+                run_manager.on_agent_action(agent_action, color="green")
+            return AgentStep(action=agent_action, observation=self.tool_cache[cache_key])
+
+        step = super()._perform_agent_action(
+            name_to_tool_map, color_mapping, agent_action, run_manager
+        )
+        observation = _serialize_observation(step.observation)
+        if cache_key is not None:
+            self.tool_cache[cache_key] = observation
+        return AgentStep(action=step.action, observation=observation)
+
+    async def _aperform_agent_action(
+        self,
+        name_to_tool_map: dict[str, BaseTool],
+        color_mapping: dict[str, str],
+        agent_action: AgentAction,
+        run_manager: AsyncCallbackManagerForChainRun | None = None,
+    ) -> AgentStep:
+        cache_key = self._get_tool_cache_key(name_to_tool_map, agent_action)
+        if cache_key is not None and cache_key in self.tool_cache:
+            if run_manager:
+                await run_manager.on_agent_action(agent_action, verbose=self.verbose, color="green")
+            return AgentStep(action=agent_action, observation=self.tool_cache[cache_key])
+
+        tool = name_to_tool_map.get(agent_action.tool)
+        if tool is not None and _is_sync_tool(tool):
+            name_to_tool_map = {
+                **name_to_tool_map,
+                agent_action.tool: _with_closing_connections(tool),
+            }
+        step = await super()._aperform_agent_action(
+            name_to_tool_map, color_mapping, agent_action, run_manager
+        )
+        observation = _serialize_observation(step.observation)
+        if cache_key is not None:
+            self.tool_cache[cache_key] = observation
+        return AgentStep(action=step.action, observation=observation)
+
+    def _perform_agent_action_in_thread(
+        self,
+        name_to_tool_map: dict[str, BaseTool],
+        color_mapping: dict[str, str],
+        agent_action: AgentAction,
+        run_manager: CallbackManagerForChainRun | None = None,
+    ) -> AgentStep:
+        try:
+            return self._perform_agent_action(
+                name_to_tool_map, color_mapping, agent_action, run_manager
+            )
+        finally:
+            # Tools may query the database, and Django opens one connection per thread:
+            connections.close_all()
@@ -0,0 +1,103 @@
+from collections.abc import Callable
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+AGENT_LLM_TAG = "django_ai_assistant_agent_llm"
+"""Tag of the LLM runs that generate the assistant response,
+to distinguish them from other LLM runs of the chain, e.g., the RAG contextualize question."""
+
+
+class DeltaCallbackHandler(BaseCallbackHandler):
+    """Callback handler that calls `on_delta` with each text token streamed by the LLM
+    that generates the assistant response.\n
+    Tokens of other LLM runs, and empty tokens from tool call chunks, are ignored.
+    That includes the LLM runs inside tools, e.g., of other assistants composed with `as_tool`,
+    since callbacks are inherited by tools and their tags don't tell them apart.
+    """
+
+    run_inline = True
+
+    def __init__(self, on_delta: Callable[[str], None]):
+        self.on_delta = on_delta
+        self._in_tool_run_ids: set[UUID] = set()
+        self._agent_llm_run_ids: set[UUID] = set()
+
+    def _on_run_start(self, run_id: UUID, parent_run_id: UUID | None):
+        if parent_run_id in self._in_tool_run_ids:
+            self._in_tool_run_ids.add(run_id)
+
+    def _on_llm_run_start(self, run_id: UUID, parent_run_id: UUID | None, tags: list[str] | None):
+        if parent_run_id in self._in_tool_run_ids:
+            self._in_tool_run_ids.add(run_id)
+        elif AGENT_LLM_TAG in (tags or []):
+            self._agent_llm_run_ids.add(run_id)
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ):
+        self._on_run_start(run_id, parent_run_id)
+
+    def on_retriever_start(
+        self,
+        serialized: dict[str, Any],
+        query: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ):
+        self._on_run_start(run_id, parent_run_id)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ):
+        self._in_tool_run_ids.add(run_id)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[Any]],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        tags: list[str] | None = None,
+        **kwargs: Any,
+    ):
+        self._on_llm_run_start(run_id, parent_run_id, tags)
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        tags: list[str] | None = None,
+        **kwargs: Any,
+    ):
+        self._on_llm_run_start(run_id, parent_run_id, tags)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        if token and run_id in self._agent_llm_run_ids:
+            self.on_delta(token)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        self._agent_llm_run_ids.discard(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._agent_llm_run_ids.discard(run_id)
@@ -0,0 +1,321 @@
+import asyncio
+import datetime
+import threading
+from decimal import Decimal
+from typing import Any
+from unittest.mock import patch
+
+from django.db import connections
+
+import pytest
+from langchain_core.agents import AgentActionMessageLog, AgentFinish
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.runnables import RunnableLambda
+
+from django_ai_assistant.langchain.agents import ParallelToolsAgentExecutor
+from django_ai_assistant.langchain.tools import tool
+from django_ai_assistant.models import Thread
+
+
+def _plan_temperature_calls(inputs, locations=("Recife", "New York"), tool_names=None):
+    if inputs["intermediate_steps"]:
+        observations = [observation for _, observation in inputs["intermediate_steps"]]
+        return AgentFinish(return_values={"output": " / ".join(observations)}, log="")
+    tool_names = tool_names or ["fetch_current_temperature"] * len(locations)
+    return [
+        AgentActionMessageLog(
+            tool=tool_name,
+            tool_input={"location": location},
+            log="",
+            message_log=[],
+        )
+        for tool_name, location in zip(tool_names, locations, strict=True)
+    ]
+
+
+def _build_executor(tools, plan=_plan_temperature_calls, **kwargs):
+    return ParallelToolsAgentExecutor(
+        agent=RunnableLambda(plan),  # pyright: ignore[reportArgumentType]
+        tools=tools,
+        **kwargs,
+    )
+
+
+def test_parallel_tools_agent_executor_runs_tools_concurrently():
+    # Both tool calls must be running at the same time to pass the barrier:
+    barrier = threading.Barrier(2, timeout=5)
+
+    @tool
+    def fetch_current_temperature(location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        barrier.wait()
+        return f"{location}: 32 degrees Celsius"
+
+    executor = _build_executor([fetch_current_temperature])
+
+    response = executor.invoke({"input": "What is the temperature in Recife and New York?"})
+
+    assert response["output"] == "Recife: 32 degrees Celsius / New York: 32 degrees Celsius"
+
+
+def test_parallel_tools_agent_executor_keeps_tool_calls_order():
+    new_york_finished = threading.Event()
+
+    @tool
+    def fetch_current_temperature(location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        if location == "Recife":
+            # Finish after the second tool call:
+            new_york_finished.wait(timeout=5)
+            return "Recife: 32 degrees Celsius"
+        new_york_finished.set()
+        return "New York: 25 degrees Celsius"
+
+    executor = _build_executor([fetch_current_temperature])
+
+    response = executor.invoke({"input": "What is the temperature in Recife and New York?"})
+
+    assert response["output"] == "Recife: 32 degrees Celsius / New York: 25 degrees Celsius"
+
+
+def test_parallel_tools_agent_executor_sequential_when_max_concurrent_tools_is_1():
+    thread_names = []
+
+    @tool
+    def fetch_current_temperature(location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        thread_names.append(threading.current_thread().name)
+        return f"{location}: 32 degrees Celsius"
+
+    executor = _build_executor([fetch_current_temperature], max_concurrent_tools=1)
+
+    response = executor.invoke({"input": "What is the temperature in Recife and New York?"})
+
+    assert response["output"] == "Recife: 32 degrees Celsius / New York: 32 degrees Celsius"
+    assert thread_names == [threading.current_thread().name] * 2
+
+
+@pytest.mark.django_db
+def test_parallel_tools_agent_executor_sequential_inside_atomic_block():
+    # Non-transactional django_db tests run inside an atomic block,
+    # like views with ATOMIC_REQUESTS:
+    Thread.objects.create(name="Uncommitted Thread")
+    thread_names = []
+
+    @tool
+    def fetch_current_temperature(location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        thread_names.append(threading.current_thread().name)
+        return str(Thread.objects.count())
+
+    executor = _build_executor([fetch_current_temperature])
+
+    response = executor.invoke({"input": "What is the temperature in Recife and New York?"})
+
+    assert response["output"] == "1 / 1"
+    assert thread_names == [threading.current_thread().name] * 2
+
+
+def test_parallel_tools_agent_executor_raises_tool_error_after_siblings_finish():
+    finished = []
+
+    @tool
+    def fetch_current_temperature(location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        if location == "Recife":
+            raise ValueError("Weather service is down")
+        finished.append(location)
+        return f"{location}: 32 degrees Celsius"
+
+    executor = _build_executor([fetch_current_temperature])
+
+    with pytest.raises(ValueError, match="Weather service is down"):
+        executor.invoke({"input": "What is the temperature in Recife and New York?"})
+    assert finished == ["New York"]
+
+
+def test_parallel_tools_agent_executor_handles_unknown_tools_without_threads():
+    barrier = threading.Barrier(2, timeout=5)
+
+    @tool
+    def fetch_current_temperature(location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        barrier.wait()
+        return f"{location}: 32 degrees Celsius"
+
+    def plan(inputs):
+        return _plan_temperature_calls(
+            inputs,
+            locations=["Recife", "Paris", "New York"],
+            tool_names=[
+                "fetch_current_temperature",
+                "fetch_weather",
+                "fetch_current_temperature",
+            ],
+        )
+
+    executor = _build_executor([fetch_current_temperature], plan=plan)
+
+    response = executor.invoke({"input": "What is the temperature in Recife, Paris and New York?"})
+
+    assert response["output"] == (
+        "Recife: 32 degrees Celsius"
+        " / fetch_weather is not a valid tool, try one of [fetch_current_temperature]."
+        " / New York: 32 degrees Celsius"
+    )
+
+
+@pytest.mark.parametrize(
+    ("output", "expected_observation"),
+    [
+        ("32 degrees Celsius", "32 degrees Celsius"),
+        (32, "32"),
+        (
+            {"temperature": Decimal("32.5"), "date": datetime.date(2024, 6, 9)},
+            '{"temperature": "32.5", "date": "2024-06-09"}',
+        ),
+        (["Recifé", None], '["Recifé", null]'),
+        ({"not_serializable": object}, "{'not_serializable': <class 'object'>}"),
+    ],
+)
+def test_parallel_tools_agent_executor_serializes_observations(output, expected_observation):
+    @tool
+    def fetch_current_temperature(location: str) -> Any:
+        """Fetch the current temperature data for a location"""
+        return output
+
+    executor = _build_executor([fetch_current_temperature], return_intermediate_steps=True)
+
+    response = executor.invoke({"input": "What is the temperature in Recife and New York?"})
+
+    assert [observation for _, observation in response["intermediate_steps"]] == [
+        expected_observation,
+        expected_observation,
+    ]
+
+
+@pytest.mark.parametrize(
+    ("metadata", "tool_cache", "expected_calls"),
+    [
+        ({"cacheable": True}, {}, ["Recife", "New York"]),
+        ({"cacheable": True}, None, ["Recife", "New York", "Recife", "New York"]),
+        (None, {}, ["Recife", "New York", "Recife", "New York"]),
+    ],
+)
+def test_parallel_tools_agent_executor_tool_cache(metadata, tool_cache, expected_calls):
+    calls = []
+
+    @tool
+    def fetch_current_temperature(location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        calls.append(location)
+        return f"{location}: 32 degrees Celsius"
+
+    fetch_current_temperature.metadata = metadata
+
+    def plan(inputs):
+        # Ask for the same tool calls twice, then finish:
+        if len(inputs["intermediate_steps"]) == 2:
+            return _plan_temperature_calls({"intermediate_steps": []})
+        return _plan_temperature_calls(inputs)
+
+    executor = _build_executor(
+        [fetch_current_temperature], plan=plan, tool_cache=tool_cache, max_concurrent_tools=1
+    )
+
+    response = executor.invoke({"input": "What is the temperature in Recife and New York?"})
+
+    assert response["output"] == " / ".join(
+        ["Recife: 32 degrees Celsius", "New York: 32 degrees Celsius"] * 2
+    )
+    assert sorted(calls) == sorted(expected_calls)
+    if tool_cache is not None and metadata:
+        assert tool_cache == {
+            ("fetch_current_temperature", '{"location": "Recife"}'): "Recife: 32 degrees Celsius",
+            (
+                "fetch_current_temperature",
+                '{"location": "New York"}',
+            ): "New York: 32 degrees Celsius",
+        }
+
+
+@pytest.mark.asyncio
+async def test_parallel_tools_agent_executor_closes_connections_of_async_path_sync_tools():
+    tool_threads = set()
+    closing_threads = set()
+
+    @tool
+    def fetch_current_temperature(location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        tool_threads.add(threading.current_thread())
+        return f"{location}: 32 degrees Celsius"
+
+    @tool
+    async def fetch_current_humidity(location: str) -> str:
+        """Fetch the current humidity data for a location"""
+        return f"{location}: 80% humidity"
+
+    def plan(inputs):
+        return _plan_temperature_calls(
+            inputs,
+            locations=["Recife", "New York"],
+            tool_names=["fetch_current_temperature", "fetch_current_humidity"],
+        )
+
+    def close_all():
+        closing_threads.add(threading.current_thread())
+
+    executor = _build_executor([fetch_current_temperature, fetch_current_humidity], plan=plan)
+
+    with patch.object(connections, "close_all", side_effect=close_all):
+        response = await executor.ainvoke({"input": "What is the weather in Recife and New York?"})
+
+    assert response["output"] == "Recife: 32 degrees Celsius / New York: 80% humidity"
+    assert tool_threads
+    assert threading.current_thread() not in tool_threads
+    assert closing_threads == tool_threads
+
+
+@pytest.mark.asyncio
+async def test_parallel_tools_agent_executor_runs_async_callbacks_on_caller_loop():
+    class LoopRecorderHandler(AsyncCallbackHandler):
+        def __init__(self):
+            self.loops = []
+
+        async def on_agent_action(self, action, **kwargs):
+            self.loops.append(("on_agent_action", asyncio.get_running_loop()))
+
+        async def on_tool_start(self, serialized, input_str, **kwargs):
+            self.loops.append(("on_tool_start", asyncio.get_running_loop()))
+
+        async def on_tool_end(self, output, **kwargs):
+            self.loops.append(("on_tool_end", asyncio.get_running_loop()))
+
+    @tool
+    def fetch_current_temperature(location: str) -> str:
+        """Fetch the current temperature data for a location"""
+        return f"{location}: 32 degrees Celsius"
+
+    fetch_current_temperature.metadata = {"cacheable": True}
+
+    def plan(inputs):
+        # Ask for the same tool call twice, so the second one is a cache hit:
+        if len(inputs["intermediate_steps"]) == 1:
+            return _plan_temperature_calls({"intermediate_steps": []}, locations=["Recife"])
+        return _plan_temperature_calls(inputs, locations=["Recife"])
+
+    handler = LoopRecorderHandler()
+    executor = _build_executor([fetch_current_temperature], plan=plan, tool_cache={})
+
+    response = await executor.ainvoke(
+        {"input": "What is the temperature in Recife?"}, config={"callbacks": [handler]}
+    )
+
+    assert response["output"] == "Recife: 32 degrees Celsius / Recife: 32 degrees Celsius"
+    assert [event for event, _ in handler.loops] == [
+        "on_agent_action",
+        "on_tool_start",
+        "on_tool_end",
+        "on_agent_action",
+    ]
+    assert {loop for _, loop in handler.loops} == {asyncio.get_running_loop()}
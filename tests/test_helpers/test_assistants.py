@@ -1,13 +1,25 @@
-from typing import List
+import asyncio
+import json
+import threading
+from typing import List, cast
 from unittest.mock import patch
 
 import pytest
 from langchain_core.documents import Document
-from langchain_core.messages import AIMessage, HumanMessage, messages_to_dict
+from langchain_core.language_models import (
+    BaseChatModel,
+    FakeListChatModel,
+    FakeMessagesListChatModel,
+)
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, messages_to_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_core.retrievers import BaseRetriever
+from langchain_core.utils.function_calling import convert_to_openai_tool
 
+from django_ai_assistant.exceptions import AIAssistantMisconfiguredError
 from django_ai_assistant.helpers.assistants import AIAssistant
 from django_ai_assistant.langchain.tools import BaseModel, Field, method_tool
+from django_ai_assistant.langchain.tools import tool as tool_decorator
 from django_ai_assistant.models import Thread
 
 
@@ -69,6 +81,20 @@ def setup_assistants():
                 ]
             )
 
+    class HelloAssistant(AIAssistant):
+        id = "hello_assistant"  # noqa: A003
+        name = "Hello Assistant"
+        instructions = "You are a helpful assistant."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            return FakeListChatModel(responses=["Hello!"])
+
+    class NonStreamingHelloAssistant(HelloAssistant):
+        id = "non_streaming_hello_assistant"  # noqa: A003
+        name = "Non-Streaming Hello Assistant"
+        streaming = False
+
     yield
     # Clear the registry after the tests in the module
     AIAssistant.clear_cls_registry()
@@ -157,11 +183,14 @@ class SequentialRetriever(BaseRetriever):
 def test_AIAssistant_with_rag_invoke():
     thread = Thread.objects.create(name="Tour Guide Chat")
 
+    # New instance per message, like in the API views,
+    # so each message gets a new SequentialRetriever:
     assistant = AIAssistant.get_cls("tour_guide_assistant")()
     response_0 = assistant.invoke(
         {"input": "I'm at Central Park W & 79st, New York, NY 10024, United States."},
         thread_id=thread.id,
     )
+    assistant = AIAssistant.get_cls("tour_guide_assistant")()
     response_1 = assistant.invoke(
         {"input": "11 W 53rd St, New York, NY 10019, United States."},
         thread_id=thread.id,
@@ -240,3 +269,525 @@ def test_AIAssistant_tool_order_same_as_declaration():
         "tool_b",
         "tool_a",
     ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.default_cassette("test_AIAssistant_invoke.yaml")
+@pytest.mark.vcr
+async def test_AIAssistant_ainvoke():
+    thread = await Thread.objects.acreate(name="Recife Temperature Chat")
+
+    assistant = AIAssistant.get_cls("temperature_assistant")()
+    response_0 = await assistant.ainvoke(
+        {"input": "What is the temperature today in Recife?"},
+        thread_id=thread.id,
+    )
+    response_1 = await assistant.ainvoke(
+        {"input": "What about tomorrow?"},
+        thread_id=thread.id,
+    )
+
+    messages_ids = [
+        m.id async for m in thread.messages.order_by("created_at").only("id").aiterator()
+    ]
+
+    assert response_0 == {
+        "history": [],
+        "input": "What is the temperature today in Recife?",
+        "output": "The current temperature in Recife today is 32 degrees Celsius.",
+    }
+    assert response_1 == {
+        "history": [
+            HumanMessage(content="What is the temperature today in Recife?", id=messages_ids[0]),
+            AIMessage(
+                content="The current temperature in Recife today is 32 degrees Celsius.",
+                id=messages_ids[1],
+            ),
+        ],
+        "input": "What about tomorrow?",
+        "output": "The forecasted temperature in Recife for tomorrow, June 10, 2024, is "
+        "expected to be 35 degrees Celsius.",
+    }
+    assert len(messages_ids) == 4
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_arun_handles_optional_thread_id_param():
+    assistant = AIAssistant.get_cls("temperature_assistant")()
+
+    with patch.object(assistant, "ainvoke", return_value={"output": "32 degrees"}) as ainvoke_spy:
+        assert await assistant.arun("What is the temperature today in Recife?") == "32 degrees"
+
+        ainvoke_spy.assert_called_once_with(
+            {"input": "What is the temperature today in Recife?"}, thread_id=None
+        )
+
+
+async def _ask_tour_guide(thread):
+    assistant = AIAssistant.get_cls("tour_guide_assistant")()
+    response_0 = await assistant.ainvoke(
+        {"input": "I'm at Central Park W & 79st, New York, NY 10024, United States."},
+        thread_id=thread.id,
+    )
+    assistant = AIAssistant.get_cls("tour_guide_assistant")()
+    response_1 = await assistant.ainvoke(
+        {"input": "11 W 53rd St, New York, NY 10019, United States."},
+        thread_id=thread.id,
+    )
+    return response_0, response_1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.default_cassette("test_AIAssistant_with_rag_invoke.yaml")
+@pytest.mark.vcr
+async def test_AIAssistant_with_rag_ainvoke():
+    thread = await Thread.objects.acreate(name="Tour Guide Chat")
+
+    response_0, response_1 = await _ask_tour_guide(thread)
+
+    assert response_0["output"].startswith("You're right by the American Museum of Natural History")
+    assert response_1["output"].startswith(
+        "You're at the location of the Museum of Modern Art (MoMA)"
+    )
+    assert await thread.messages.acount() == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.default_cassette("test_AIAssistant_invoke.yaml")
+@pytest.mark.vcr("test_AIAssistant_with_rag_invoke.yaml")
+async def test_AIAssistant_ainvoke_runs_independent_threads_concurrently():
+    temperature_thread = await Thread.objects.acreate(name="Recife Temperature Chat")
+    tour_guide_thread = await Thread.objects.acreate(name="Tour Guide Chat")
+
+    async def ask_temperature():
+        assistant = AIAssistant.get_cls("temperature_assistant")()
+        response_0 = await assistant.arun(
+            "What is the temperature today in Recife?", thread_id=temperature_thread.id
+        )
+        response_1 = await assistant.arun("What about tomorrow?", thread_id=temperature_thread.id)
+        return response_0, response_1
+
+    temperature_responses, tour_guide_responses = await asyncio.gather(
+        ask_temperature(),
+        _ask_tour_guide(tour_guide_thread),
+    )
+
+    assert temperature_responses == (
+        "The current temperature in Recife today is 32 degrees Celsius.",
+        "The forecasted temperature in Recife for tomorrow, June 10, 2024, is "
+        "expected to be 35 degrees Celsius.",
+    )
+    assert tour_guide_responses[1]["output"].startswith(
+        "You're at the location of the Museum of Modern Art (MoMA)"
+    )
+    assert await temperature_thread.messages.acount() == 4
+    assert await tour_guide_thread.messages.acount() == 4
+
+
+def test_AIAssistant_retriever_cached_per_instance():
+    assistant_cls = AIAssistant.get_cls("tour_guide_assistant")
+    assistant = assistant_cls()
+
+    with patch.object(
+        assistant, "get_retriever", wraps=assistant.get_retriever
+    ) as get_retriever_spy:
+        assistant.as_chain(None)
+        assistant.as_chain(None)
+
+    get_retriever_spy.assert_called_once_with()
+    assert assistant._retriever is not None
+    assert assistant_cls()._retriever is None
+
+
+def test_AIAssistant_tool_methods_discovery_cached_per_class():
+    assistant_cls = AIAssistant.get_cls("temperature_assistant")
+    assistant_cls()
+
+    with patch("inspect.getsourcelines") as getsourcelines_spy:
+        assistant = assistant_cls()
+        other_assistant = assistant_cls()
+
+    getsourcelines_spy.assert_not_called()
+    assert [t.name for t in assistant._method_tools] == [
+        "fetch_current_temperature",
+        "fetch_forecast_temperature",
+    ]
+    # Tools are still bound to their own assistant instance:
+    assert assistant._method_tools[0].func.__self__ is assistant  # pyright: ignore
+    assert other_assistant._method_tools[0].func.__self__ is other_assistant  # pyright: ignore
+
+
+def test_AIAssistant_tool_args_schemas_cached_per_class():
+    assistant_cls = AIAssistant.get_cls("temperature_assistant")
+    assistant = assistant_cls()
+    other_assistant = assistant_cls()
+
+    for tool, other_tool in zip(
+        assistant._method_tools, other_assistant._method_tools, strict=True
+    ):
+        assert tool.args_schema is other_tool.args_schema
+    assert [t.args for t in other_assistant._method_tools] == [
+        {"location": {"title": "Location", "type": "string"}},
+        {
+            "location": {"title": "Location", "type": "string"},
+            "dt_str": {
+                "title": "Dt Str",
+                "description": "Date in the format 'YYYY-MM-DD'",
+                "type": "string",
+            },
+        },
+    ]
+
+
+def test_AIAssistant_llm_tools_cached_per_class():
+    assistant_cls = AIAssistant.get_cls("temperature_assistant")
+    assistant = assistant_cls()
+    other_assistant = assistant_cls()
+
+    @tool_decorator
+    def fetch_weather(location: str) -> str:
+        """Fetch the weather for a location"""
+        return "Sunny"
+
+    llm_tools = assistant._get_llm_tools(assistant.get_tools())
+    other_llm_tools = other_assistant._get_llm_tools([*other_assistant.get_tools(), fetch_weather])
+
+    assert llm_tools == [convert_to_openai_tool(t) for t in other_assistant.get_tools()]
+    assert other_llm_tools[0] is llm_tools[0]
+    assert other_llm_tools[1] is llm_tools[1]
+    # Tools that are not method tools are left for bind_tools:
+    assert other_llm_tools[2] is fetch_weather
+
+
+def test_AIAssistant_llm_tools_use_per_instance_tool_descriptions():
+    class OrdersAssistant(AIAssistant):
+        id = "orders_assistant"  # noqa: A003
+        name = "Orders Assistant"
+        instructions = "You are an orders bot."
+        model = "gpt-4o"
+
+        def get_tools(self):
+            tools = super().get_tools()
+            tools[0].description = f"Get orders of {self._user}"
+            return tools
+
+        @method_tool
+        def get_orders(self) -> str:
+            """Get orders"""
+            return "No orders"
+
+    alice_assistant = OrdersAssistant(user="alice")
+    bob_assistant = OrdersAssistant(user="bob")
+
+    alice_llm_tools = alice_assistant._get_llm_tools(alice_assistant.get_tools())
+    bob_llm_tools = bob_assistant._get_llm_tools(bob_assistant.get_tools())
+    other_alice_llm_tools = alice_assistant._get_llm_tools(alice_assistant.get_tools())
+
+    assert alice_llm_tools[0]["function"]["description"] == "Get orders of alice"
+    assert bob_llm_tools[0]["function"]["description"] == "Get orders of bob"
+    assert other_alice_llm_tools[0]["function"]["description"] == "Get orders of alice"
+
+
+@pytest.mark.parametrize(
+    ("assistant_id", "streaming"),
+    [("hello_assistant", True), ("non_streaming_hello_assistant", False)],
+)
+def test_AIAssistant_streaming_controls_llm_streaming(assistant_id, streaming):
+    assistant = AIAssistant.get_cls(assistant_id)()
+
+    with patch.object(
+        FakeListChatModel, "_stream", autospec=True, side_effect=FakeListChatModel._stream
+    ) as stream_spy:
+        assert assistant.run("Hi") == "Hello!"
+
+    assert stream_spy.called is streaming
+
+
+def test_AIAssistant_run_streams_deltas_to_on_delta():
+    assistant = AIAssistant.get_cls("hello_assistant")()
+    deltas = []
+
+    assert assistant.run("Hi", on_delta=deltas.append) == "Hello!"
+    assert deltas == list("Hello!")
+
+
+@pytest.mark.asyncio
+async def test_AIAssistant_arun_streams_deltas_to_on_delta():
+    assistant = AIAssistant.get_cls("hello_assistant")()
+    deltas = []
+
+    assert await assistant.arun("Hi", on_delta=deltas.append) == "Hello!"
+    assert deltas == list("Hello!")
+
+
+def test_AIAssistant_on_delta_requires_streaming():
+    assistant = AIAssistant.get_cls("non_streaming_hello_assistant")()
+
+    with pytest.raises(AIAssistantMisconfiguredError, match="streaming=False"):
+        assistant.run("Hi", on_delta=print)
+
+
+class FakeToolsChatModel(FakeMessagesListChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+class StreamingFakeToolsChatModel(FakeToolsChatModel):
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        result = self._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        message = cast(AIMessage, result.generations[0].message)
+        for token in [*message.content] or [""]:
+            tool_call_chunks = [
+                {
+                    "name": tool_call["name"],
+                    "args": json.dumps(tool_call["args"]),
+                    "id": tool_call["id"],
+                    "index": index,
+                }
+                for index, tool_call in enumerate(message.tool_calls)
+            ]
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(content=token, tool_call_chunks=tool_call_chunks)
+            )
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_on_delta_ignores_tokens_of_assistants_in_tools():
+    class InnerAssistant(AIAssistant):
+        id = "inner_assistant"  # noqa: A003
+        name = "Inner Assistant"
+        instructions = "You are an inner assistant."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            return FakeListChatModel(responses=["INNER"])
+
+    class OuterAssistant(AIAssistant):
+        id = "outer_assistant"  # noqa: A003
+        name = "Outer Assistant"
+        instructions = "You are an outer assistant."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            tool_call = {"name": "inner_assistant", "args": {"__arg1": "Hi"}, "id": "call_1"}
+            return StreamingFakeToolsChatModel(
+                responses=[
+                    AIMessage(content="", tool_calls=[tool_call]),
+                    AIMessage(content="OUTER"),
+                ]
+            )
+
+        def get_tools(self):
+            return [InnerAssistant().as_tool(description="Inner assistant")]
+
+    deltas = []
+
+    assert OuterAssistant().run("Hi", on_delta=deltas.append) == "OUTER"
+    assert deltas == list("OUTER")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_cacheable_tool_outputs_cached_per_thread():
+    calls = []
+
+    class CachedTemperatureAssistant(AIAssistant):
+        id = "cached_temperature_assistant"  # noqa: A003
+        name = "Cached Temperature Assistant"
+        instructions = "You are a temperature bot."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            tool_call = {
+                "name": "fetch_current_temperature",
+                "args": {"location": "Recife"},
+                "id": "call_1",
+            }
+            return FakeToolsChatModel(
+                responses=[
+                    AIMessage(content="", tool_calls=[tool_call]),
+                    AIMessage(content="It's 32 degrees Celsius."),
+                ]
+            )
+
+        @method_tool(cacheable=True)
+        def fetch_current_temperature(self, location: str) -> str:
+            """Fetch the current temperature data for a location"""
+            calls.append(location)
+            return "32 degrees Celsius"
+
+    assistant = CachedTemperatureAssistant()
+    thread = Thread.objects.create(name="Recife Temperature Chat")
+    other_thread = Thread.objects.create(name="Other Recife Temperature Chat")
+
+    assert assistant._method_tools[0].metadata == {"cacheable": True}
+    assert (
+        assistant.run("Temperature in Recife?", thread_id=thread.id) == "It's 32 degrees Celsius."
+    )
+    assert (
+        assistant.run("Temperature in Recife?", thread_id=thread.id) == "It's 32 degrees Celsius."
+    )
+    assert calls == ["Recife"]
+    assert assistant.run("Temperature in Recife?", thread_id=other_thread.id) == (
+        "It's 32 degrees Celsius."
+    )
+    assert calls == ["Recife", "Recife"]
+
+    # Runs without a thread are independent conversations:
+    calls.clear()
+    assert assistant.run("Temperature in Recife?") == "It's 32 degrees Celsius."
+    assert assistant.run("Temperature in Recife?") == "It's 32 degrees Celsius."
+    assert calls == ["Recife", "Recife"]
+
+
+@pytest.mark.parametrize(("max_concurrent_tools", "expected_thread_count"), [(8, 2), (1, 1)])
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_max_concurrent_tools(max_concurrent_tools, expected_thread_count):
+    concurrency = max_concurrent_tools
+    barrier = threading.Barrier(expected_thread_count, timeout=5)
+    thread_names = set()
+
+    class TemperatureAssistant(AIAssistant):
+        id = "concurrent_temperature_assistant"  # noqa: A003
+        name = "Concurrent Temperature Assistant"
+        instructions = "You are a temperature bot."
+        model = "gpt-4o"
+        max_concurrent_tools = concurrency
+
+        def get_llm(self):
+            tool_calls = [
+                {
+                    "name": "fetch_current_temperature",
+                    "args": {"location": location},
+                    "id": f"call_{location}",
+                }
+                for location in ["Recife", "New York"]
+            ]
+            return FakeToolsChatModel(
+                responses=[
+                    AIMessage(content="", tool_calls=tool_calls),
+                    AIMessage(content="It's 32 degrees Celsius in both."),
+                ]
+            )
+
+        @method_tool
+        def fetch_current_temperature(self, location: str) -> str:
+            """Fetch the current temperature data for a location"""
+            thread_names.add(threading.current_thread().name)
+            barrier.wait()
+            return "32 degrees Celsius"
+
+    assert TemperatureAssistant().run("Temperature in Recife and New York?") == (
+        "It's 32 degrees Celsius in both."
+    )
+    assert len(thread_names) == expected_thread_count
+
+
+class EchoChatModel(BaseChatModel):
+    barrier: threading.Barrier | None = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.barrier:
+            self.barrier.wait()
+        message = AIMessage(content=f"Echo: {messages[-1].content}")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_AIAssistant_batch_invoke():
+    # All invocations must be running at the same time to pass the barrier:
+    barrier = threading.Barrier(3, timeout=5)
+
+    class EchoAssistant(AIAssistant):
+        id = "echo_assistant"  # noqa: A003
+        name = "Echo Assistant"
+        instructions = "You are an echo bot."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            return EchoChatModel(barrier=barrier)
+
+    thread = Thread.objects.create(name="Echo Chat")
+    assistant = EchoAssistant()
+
+    responses = assistant.batch_invoke(
+        [{"input": "Hi"}, {"input": "Hello"}, {"input": "Hey"}],
+        thread_ids=[None, thread.id, None],
+    )
+
+    assert [response["output"] for response in responses] == [
+        "Echo: Hi",
+        "Echo: Hello",
+        "Echo: Hey",
+    ]
+    assert thread.messages.count() == 2
+
+
+def test_AIAssistant_batch_invoke_uses_one_instance_per_input():
+    instances = []
+    user = object()
+
+    class EchoAssistant(AIAssistant):
+        id = "echo_assistant"  # noqa: A003
+        name = "Echo Assistant"
+        instructions = "You are an echo bot."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            instances.append(self)
+            return EchoChatModel()
+
+    assistant = EchoAssistant(user=user, extra="value")
+
+    responses = assistant.batch_invoke([{"input": "Hi"}, {"input": "Hello"}])
+
+    assert [response["output"] for response in responses] == ["Echo: Hi", "Echo: Hello"]
+    assert len({id(instance) for instance in instances}) == 2
+    assert assistant not in instances
+    for instance in instances:
+        assert instance._user is user
+        assert instance._init_kwargs == {"extra": "value"}
+
+
+@pytest.mark.django_db
+def test_AIAssistant_batch_invoke_sequential_inside_atomic_block():
+    # Non-transactional django_db tests run inside an atomic block,
+    # like views with ATOMIC_REQUESTS:
+    thread_names = []
+
+    class EchoAssistant(AIAssistant):
+        id = "echo_assistant"  # noqa: A003
+        name = "Echo Assistant"
+        instructions = "You are an echo bot."
+        model = "gpt-4o"
+
+        def get_llm(self):
+            thread_names.append(threading.current_thread().name)
+            return EchoChatModel()
+
+    thread = Thread.objects.create(name="Echo Chat")
+
+    responses = EchoAssistant().batch_invoke(
+        [{"input": "Hi"}, {"input": "Hello"}],
+        thread_ids=[thread.id, None],
+    )
+
+    assert [response["output"] for response in responses] == ["Echo: Hi", "Echo: Hello"]
+    assert thread_names == [threading.current_thread().name] * 2
+    assert thread.messages.count() == 2
+
+
+def test_AIAssistant_batch_invoke_validates_thread_ids_length():
+    assistant = AIAssistant.get_cls("temperature_assistant")()
+
+    with pytest.raises(ValueError, match="same length"):
+        assistant.batch_invoke([{"input": "Hi"}, {"input": "Hello"}], thread_ids=[None])
@@ -0,0 +1,94 @@
+import asyncio
+import gc
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from django_ai_assistant.helpers.assistants import AIAssistant
+from django_ai_assistant.helpers.http_clients import (
+    get_http_async_client,
+    get_shared_http_client,
+)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_assistants():
+    # Clear the registry before the tests in the module
+    AIAssistant.clear_cls_registry()
+
+    class HelloAssistant(AIAssistant):
+        id = "hello_assistant"  # noqa: A003
+        name = "Hello Assistant"
+        instructions = "You are a helpful assistant."
+        model = "gpt-4o"
+
+    yield
+    # Clear the registry after the tests in the module
+    AIAssistant.clear_cls_registry()
+
+
+def test_get_shared_http_client_returns_same_client():
+    assert get_shared_http_client() is get_shared_http_client()
+
+
+@pytest.fixture()
+def local_server_url():
+    class OkHandler(BaseHTTPRequestHandler):
+        # Keep connections open, so the client pools them:
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):  # noqa: N802
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_http_async_client_returns_new_client():
+    async def get_clients():
+        return get_http_async_client(), get_http_async_client()
+
+    client_0, client_1 = asyncio.run(get_clients())
+
+    assert client_0 is not client_1
+
+
+def test_get_http_async_client_frees_client_and_event_loop_after_requests(local_server_url):
+    async def make_request():
+        client = get_http_async_client()
+        response = await client.get(local_server_url)
+        assert response.text == "ok"
+        return weakref.ref(client), weakref.ref(asyncio.get_running_loop())
+
+    refs = [asyncio.run(make_request()) for _ in range(3)]
+    gc.collect()
+
+    assert [(client_ref(), loop_ref()) for client_ref, loop_ref in refs] == [(None, None)] * 3
+
+
+def test_http_clients_share_ssl_context():
+    client = get_shared_http_client()
+    async_client = get_http_async_client()
+
+    assert (
+        client._transport._pool._ssl_context  # pyright: ignore
+        is async_client._transport._pool._ssl_context  # pyright: ignore
+    )
+
+
+def test_AIAssistant_get_llm_uses_shared_http_client():
+    llm = AIAssistant.get_cls("hello_assistant")().get_llm()
+
+    assert llm.http_client is get_shared_http_client()  # pyright: ignore[reportAttributeAccessIssue]